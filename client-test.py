@@ -20,6 +20,7 @@ Architecture:
 
 import asyncio
 import json
+import zlib
 import threading
 import queue
 import customtkinter as ctk
@@ -37,6 +38,11 @@ out_queue = queue.Queue()        # Messages FROM GUI TO server
 in_queue = queue.Queue()         # Messages FROM server TO GUI
 connected = False                # Global connection status
 
+# Frame size limits
+MAX_MESSAGE_SIZE = 4096          # Server's max_size for frames sent by a client
+MAX_SERVER_FRAME_SIZE = 2**20    # websockets default: room lists and batches grow with the server state
+DEFLATE_PREFIX = b"\x01"          # Server marks large broadcasts deflated once (binary frame)
+
 # ==================================================================
 # NETWORK PROTOCOL HELPERS
 # ==================================================================
@@ -72,7 +78,7 @@ async def network_loop(uri, username):
     """
     global connected
     try:
-        async with websockets.connect(uri, ping_interval=20, ping_timeout=10) as ws:
+        async with websockets.connect(uri, compression=None, max_size=MAX_SERVER_FRAME_SIZE, ping_interval=20, ping_timeout=10) as ws:
             connected = True
             # Identify ourselves to the server
             await ws.send(json.dumps({"action": "identify", "payload": {"username": username}}))
@@ -81,11 +87,19 @@ async def network_loop(uri, username):
                 """Continuously receive and parse messages from server."""
                 async for raw in ws:
                     try:
+                        # Large broadcasts arrive deflated in a binary frame
+                        if isinstance(raw, bytes) and raw.startswith(DEFLATE_PREFIX):
+                            raw = zlib.decompress(raw[1:])
                         obj = json.loads(raw)
                     except:
                         in_queue.put({"action": "error", "payload": {"reason": "invalid_json"}})
                         continue
-                    in_queue.put(obj)
+                    # The server coalesces bursts into a single "batch" frame
+                    if obj.get("action") == "batch":
+                        for item in obj.get("payload", {}).get("items", []):
+                            in_queue.put(item)
+                    else:
+                        in_queue.put(obj)
 
             recv_task = asyncio.create_task(receiver())
 
@@ -450,6 +464,10 @@ class ChatClientUI:
         self.joined_rooms = set(["default"]) # Set of rooms user is member of
         self.viewed_room = None              # Currently displayed room (can be view-only)
         
+        # Batched redraw (poll_incoming redraws the viewed room once per drain)
+        self.defer_refresh = False           # True while poll_incoming drains in_queue
+        self.refresh_pending = False         # Viewed room changed during the current drain
+        
         # Profile pictures
         self.user_avatars = {}               # Maps username -> PhotoImage avatar
         self.current_avatar_path = None      # Path to current user's avatar
@@ -978,6 +996,10 @@ class ChatClientUI:
         text = self.msg_entry.get().strip()
         if not text:
             return
+        # The server closes the connection on frames above MAX_MESSAGE_SIZE
+        if len(json.dumps({"action": "sendMessage", "message": text, "room": self.viewed_room})) > MAX_MESSAGE_SIZE:
+            show_error("Error", "Message too long.")
+            return
         # Send message to viewed room
         send_action("sendMessage", {"message": text, "room": self.viewed_room})
         self.msg_entry.delete(0, "end")
@@ -1014,6 +1036,19 @@ class ChatClientUI:
 
         # Si on affiche cette room, rafraîchir l'affichage
         if self.viewed_room == target_room:
+            self.request_refresh()
+
+    def request_refresh(self):
+        """Redraw the viewed room now, or once at the end of the current poll drain."""
+        if self.defer_refresh:
+            self.refresh_pending = True
+        else:
+            self.refresh_chat_display()
+
+    def flush_refresh(self):
+        """Perform the redraw requested during a poll drain, if any."""
+        if self.refresh_pending:
+            self.refresh_pending = False
             self.refresh_chat_display()
 
     def refresh_chat_display(self):
@@ -1135,8 +1170,11 @@ class ChatClientUI:
         - Connection events
         
         This bridges async network thread with sync Tkinter GUI.
+        Chat redraws are deferred and done once at the end of the drain,
+        so a burst of N messages costs one redraw instead of N.
         """
         
+        self.defer_refresh = True
         while not in_queue.empty():
             obj = in_queue.get()
             action = obj.get("action")
@@ -1188,7 +1226,7 @@ class ChatClientUI:
 
                 # Si l'utilisateur visualise cette room, rafraîchir et indiquer qu'elle est jointe
                 if self.viewed_room == room:
-                    self.refresh_chat_display()
+                    self.request_refresh()
                     self.update_room_info(room, self.room_counts.get(room))
 
             elif action == "left":
@@ -1202,7 +1240,7 @@ class ChatClientUI:
 
                 # Si on visualise cette room, rafraîchir l'affichage et mettre à jour le label
                 if self.viewed_room == room:
-                    self.refresh_chat_display()
+                    self.request_refresh()
                     self.update_room_info(room)
 
             elif action == "message":
@@ -1215,9 +1253,15 @@ class ChatClientUI:
             elif action == "error":
                 reason = payload.get("reason", "")
                 detail = payload.get("detail", "")
+                # Show what arrived before the error behind the dialog
+                self.flush_refresh()
                 show_error("Server error", f"{reason}\n{detail}")
                 self.append_chat("SYSTEM", f"{reason} {detail}", system=True)
 
+        # Redraw the viewed room once for the whole drain
+        self.defer_refresh = False
+        self.flush_refresh()
+
         # Schedule next poll in 100ms
         self.master.after(100, self.poll_incoming)
 
@@ -6,6 +6,11 @@ import tkinter as tk
 from tkinter import simpledialog, messagebox, scrolledtext
 import websockets
 
+try:
+    import msgpack  # optionnel : format binaire MessagePack, si le serveur l'accepte
+except ImportError:
+    msgpack = None
+
 # ------------------------------------------------------------------
 # Queues pour communiquer entre le thread UI (Tkinter) et le réseau
 # ------------------------------------------------------------------
@@ -16,6 +21,13 @@ in_queue = queue.Queue()    # réseau -> UI (dictionnaires Python)
 current_room = None
 connected = False
 
+# Limites de taille des trames
+MAX_MESSAGE_SIZE = 4096         # max_size du serveur pour les trames envoyées par le client
+MAX_SERVER_FRAME_SIZE = 2**20   # défaut de websockets : les listes de rooms et les batchs grossissent avec le serveur
+
+# Sous-protocoles proposés au serveur (par ordre de préférence)
+SUBPROTOCOLS = ["msgpack", "json"] if msgpack is not None else None
+
 # ------------------------------------------------------------------
 # Protocol helper : construire et envoyer des objets (Python dict)
 # ------------------------------------------------------------------
@@ -31,20 +43,33 @@ def send_action(action, payload=None):
 async def network_loop(uri, username):
     global connected, current_room
     try:
-        async with websockets.connect(uri, ping_interval=20, ping_timeout=10) as ws:
+        async with websockets.connect(uri, compression=None, max_size=MAX_SERVER_FRAME_SIZE, ping_interval=20, ping_timeout=10, subprotocols=SUBPROTOCOLS) as ws:
             connected = True
+            # Format choisi par le serveur : MessagePack (trames binaires) ou JSON
+            if ws.subprotocol == "msgpack":
+                encode = msgpack.packb
+                decode = lambda raw: msgpack.unpackb(raw, raw=False)
+            else:
+                encode = json.dumps
+                decode = json.loads
+
             # Identify (obligatoire)
-            await ws.send(json.dumps({"action": "identify", "payload": {"username": username}}))
+            await ws.send(encode({"action": "identify", "payload": {"username": username}}))
 
             # task pour recevoir en continu
             async def receiver():
                 async for raw in ws:
                     try:
-                        obj = json.loads(raw)
+                        obj = decode(raw)
                     except Exception:
                         in_queue.put({"action": "error", "payload": {"reason": "invalid_json"}})
                         continue
-                    in_queue.put(obj)
+                    # Le serveur regroupe les messages en attente dans une trame "batch"
+                    if obj.get("action") == "batch":
+                        for item in obj.get("payload", {}).get("items", []):
+                            in_queue.put(item)
+                    else:
+                        in_queue.put(obj)
 
             recv_task = asyncio.create_task(receiver())
 
@@ -58,7 +83,7 @@ async def network_loop(uri, username):
                         continue
 
                     # Envoi effectif
-                    await ws.send(json.dumps(data))
+                    await ws.send(encode(data))
             except websockets.ConnectionClosed:
                 in_queue.put({"action": "error", "payload": {"reason": "connection_closed"}})
             finally:
@@ -209,12 +234,21 @@ class ChatClientUI:
         text = self.msg_entry.get().strip()
         if not text:
             return
+        if len(json.dumps({"action": "sendMessage", "message": text})) > MAX_MESSAGE_SIZE:
+            messagebox.showerror("Error", "Message too long.")
+            return
         send_action("sendMessage", {"message": text})
         self.msg_entry.delete(0, tk.END)
 
     def append_chat(self, text):
+        self.append_chat_lines([text])
+
+    def append_chat_lines(self, lines):
+        """Ajoute plusieurs lignes avec un seul passage NORMAL -> DISABLED."""
+        if not lines:
+            return
         self.chat_box.config(state=tk.NORMAL)
-        self.chat_box.insert(tk.END, text + "\n")
+        self.chat_box.insert(tk.END, "\n".join(lines) + "\n")
         self.chat_box.see(tk.END)
         self.chat_box.config(state=tk.DISABLED)
 
@@ -227,6 +261,8 @@ class ChatClientUI:
     def poll_incoming(self):
         global current_room
         global ipaddress
+        # Lignes de chat accumulées pendant ce passage, affichées en une fois
+        pending_lines = []
         while not in_queue.empty():
             obj = in_queue.get()
             action = obj.get("action")
@@ -240,12 +276,12 @@ class ChatClientUI:
 
             elif action == "joined":
                 room = payload.get("room")
-                self.append_chat(f"*** You joined {room} ***")
+                pending_lines.append(f"*** You joined {room} ***")
                 current_room = room
 
             elif action == "left":
                 room = payload.get("room")
-                self.append_chat(f"*** You left the room ***")
+                pending_lines.append(f"*** You left the room ***")
                 current_room = None
 
             elif action == "message":
@@ -254,18 +290,22 @@ class ChatClientUI:
                 room = p.get("room", "")
                 msg = p.get("message", "")
                 line = f"[{room}] {frm}: {msg}"
-                self.append_chat(line)
+                pending_lines.append(line)
 
             elif action == "error":
                 reason = payload.get("reason", "unknown")
                 detail = payload.get("detail", "")
-                self.append_chat(f"[ERROR] {reason} {detail}")
+                pending_lines.append(f"[ERROR] {reason} {detail}")
                 if reason in ("username_taken", "unable_to_connect"):
+                    # Afficher les lignes en attente avant la boîte modale
+                    self.append_chat_lines(pending_lines)
+                    pending_lines = []
                     messagebox.showerror("Server error", f"{reason}\n{detail}")
 
             else:
-                self.append_chat(f"[DEBUG] {obj}")
+                pending_lines.append(f"[DEBUG] {obj}")
 
+        self.append_chat_lines(pending_lines)
         self.master.after(100, self.poll_incoming)
 
 # ------------------------------------------------------------------
@@ -10,6 +10,8 @@ Features:
 - Room creation, joining, leaving, deletion
 - Message broadcasting to room members only
 - Automatic user count synchronization
+- Per-client outbound queues; queued bursts are coalesced into "batch" frames
+- Large broadcasts are deflated once and shared by every recipient
 
 Protocol: JSON-based WebSocket messages
 Port: 20200
@@ -17,35 +19,149 @@ Port: 20200
 
 import asyncio 
 import websockets as ws
+from websockets.asyncio.server import serve   # New asyncio implementation, not the legacy one
 import json
-import datetime
+import itertools
 import logging
+import logging.handlers
+import atexit
+import threading
+import zlib
+import bisect
+from dataclasses import dataclass, field, fields
+from functools import lru_cache
+from queue import SimpleQueue
+
+try:
+    import orjson           # Optional C encoder, produces UTF-8 bytes directly
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec          # Optional typed decoder for inbound actions
+except ImportError:
+    msgspec = None
+
+try:
+    import uvloop           # Optional faster event loop (not available on Windows)
+except ImportError:
+    uvloop = None
 
 # ==================================================================
 # SERVER STATE MANAGEMENT
 # ==================================================================
-connected_clients = set()       # Set of all connected websocket clients
+connected_clients = set()       # All connected websocket clients
 rooms = {"default": set()}      # Maps room_name -> set of clients in that room
+EMPTY_ROOM = frozenset()        # Shared member set of every empty room except "default"
+room_counts = {"default": 0}    # Maps room_name -> number of clients, kept in step with rooms
+room_names = ["default"]        # Sorted names of all rooms, for prefix queries
 client_rooms = dict()           # Maps websocket -> set of rooms client has joined
-users = dict()                  # Maps websocket -> username
+client_queues = dict()          # Maps websocket -> asyncio.Queue of outbound frames
+background_tasks = set()        # Strong references to fire-and-forget tasks
+anon_ids = itertools.count(1)   # Ids for the placeholder usernames of new clients
 typing_users = dict()           # Maps websocket -> room (for typing indicator, future feature)
+rooms_list_cache = None         # Encoded roomsList frame, None when rooms or counts changed
+
+# Connection limits, sized for small chat frames
+MAX_MESSAGE_SIZE = 4096         # Largest frame accepted from a client (bytes)
+MAX_QUEUE = 32                  # Incoming frames buffered per connection
+WRITE_LIMIT = 16384             # Outgoing buffer high-water mark (bytes)
+PING_INTERVAL = 20              # Seconds between keepalive pings
+PING_TIMEOUT = 20               # Seconds to wait for a pong before closing
+
+# Outbound write limits
+SEND_TIMEOUT = 5.0              # Seconds before a stalled client is disconnected
+MAX_OUTBOUND_QUEUE = 1024       # Frames queued per client before it is dropped as too slow
+WRITE_DELAY = 0.01              # Seconds the writer waits to collect more frames (0 disables)
+MAX_FRAMES_IN_BATCH = 16        # Frames merged into one "batch" frame at most
+COMPRESS_MIN_SIZE = 1024        # Broadcast frames at least this large are deflated once
+DEFLATE_PREFIX = b"\x01"        # First byte of a deflated binary frame
+
+@dataclass(slots=True)
+class ClientState:
+    """Per-connection state handed to every action handler."""
+    username: str
+    peer: str               # str(remote_address), formatted once at connect
+    message: dict = field(init=False)   # Reusable "message" object, patched per sendMessage
+
+    def __post_init__(self):
+        self.message = {"action": "message", "payload": {"from": self.username, "room": None, "message": None}}
+
+    def set_username(self, username):
+        """Change the username, including the "from" field of the message template."""
+        self.username = username
+        self.message["payload"]["from"] = username
 
 # ==================================================================
 # LOGGING SETUP
 # ==================================================================
+# Log calls only enqueue the record; a QueueListener thread does the
+# file writes, so the event loop never blocks on disk I/O.
+# The file is opened in "w" mode, which clears previous logs.
+log_queue = SimpleQueue()
+log_file_handler = logging.FileHandler("server.log", mode="w")
+log_file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s: %(message)s"))
+log_listener = logging.handlers.QueueListener(log_queue, log_file_handler)
 logging.basicConfig(
-    filename="server.log",
-    level=logging.DEBUG,
-    format="%(asctime)s - %(levelname)s: %(message)s"
+    level=logging.INFO,     # DEBUG also logs every websocket frame
+    format="%(message)s",   # Only merge the args; the file handler adds time and level
+    handlers=[logging.handlers.QueueHandler(log_queue)]
 )
-
-# Clear previous logs
-with open("server.log", "w+"):
-    pass
+log_listener.start()
+atexit.register(log_listener.stop)  # Flush queued records on exit
+logger = logging.getLogger(__name__)
 
 # ==================================================================
 # UTILITY FUNCTIONS
 # ==================================================================
+if orjson is not None:
+    def encode_json(obj):
+        """Encode to compact UTF-8 JSON bytes (room names may be non-str keys)."""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    decode_json = orjson.loads
+else:
+    def encode_json(obj):
+        """Stdlib fallback for orjson.dumps: compact UTF-8 JSON bytes."""
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+    decode_json = json.loads
+
+# Inbound client message. Unknown keys are ignored; a frame that is not
+# a JSON object or has mistyped fields raises ValueError, and is skipped
+# like invalid JSON (with or without msgspec).
+if msgspec is not None:
+    class Action(msgspec.Struct, kw_only=True):
+        action: str | None = None
+        room: str | None = None
+        message: str | None = None
+        newUsername: str | None = None
+        payload: dict | None = None
+
+    decode_action = msgspec.json.Decoder(Action).decode
+else:
+    @dataclass(slots=True, kw_only=True)
+    class Action:
+        action: str | None = None
+        room: str | None = None
+        message: str | None = None
+        newUsername: str | None = None
+        payload: dict | None = None
+
+    # Field name -> annotation, e.g. str | None (usable with isinstance)
+    ACTION_FIELDS = {f.name: f.type for f in fields(Action)}
+
+    def decode_action(raw):
+        """Stdlib fallback for the msgspec decoder: JSON text -> Action."""
+        obj = decode_json(raw)
+        if not isinstance(obj, dict):
+            raise ValueError("Expected a JSON object")
+        values = {}
+        for key, kind in ACTION_FIELDS.items():
+            if key in obj:
+                if not isinstance(obj[key], kind):
+                    raise ValueError(f"Invalid type for {key!r}")
+                values[key] = obj[key]
+        return Action(**values)
+
 def getIPAddress():
     """Get the server's public IP address."""
     import socket
@@ -61,7 +177,25 @@ print(f"Server IP: {ipaddress}")
 # ==================================================================
 # COMMAND LINE INTERFACE
 # ==================================================================
-async def cli(server):
+def stdin_reader(loop, cli_q):
+    """
+    Blocking stdin reader, run on a dedicated daemon thread.
+
+    Each line is handed to the event loop through cli_q, so the CLI
+    never occupies a slot of the default executor.
+    """
+    while True:
+        try:
+            line = input("> ")
+        except EOFError:
+            break
+        loop.call_soon_threadsafe(cli_q.put_nowait, line)
+        # Stop reading once shutdown is requested, so the thread is not
+        # left blocked on stdin while the interpreter finalizes
+        if line.strip() in ("quit", "exit"):
+            break
+
+async def cli(server, cli_q):
     """
     Interactive CLI for server administration.
     
@@ -71,18 +205,17 @@ async def cli(server):
     - quit/exit: Gracefully shutdown server
     """
     while True:
-        cmd = await asyncio.get_event_loop().run_in_executor(None, input, "> ")
+        cmd = (await cli_q.get()).strip()
 
         match cmd:
             case "rooms":
-                print(f"Rooms: {rooms.keys()}")
+                print(f"Rooms: {list(rooms)}")
             case "clients":
-                print(f"Connected clients: {connected_clients}, count: {len(connected_clients)}")
+                print(f"Connected clients: {list(connected_clients)}, count: {len(connected_clients)}")
             case "quit" | "exit":
                 print(f"Shutting down server...")
-                # Close all client connections
-                for client in list(connected_clients):
-                    await client.close()
+                # Close all client connections concurrently, not one handshake at a time
+                await asyncio.gather(*(client.close() for client in tuple(connected_clients)), return_exceptions=True)
                 # Shutdown server
                 server.close()
                 await server.wait_closed()
@@ -93,7 +226,41 @@ async def cli(server):
 # ==================================================================
 # MESSAGE SENDING & BROADCASTING
 # ==================================================================
-async def sendjson(websocket, obj):
+def send_frame(websocket, frame):
+    """
+    Queue an already encoded JSON frame for a specific client.
+    
+    The frame is written by the client's writer task, so callers never
+    wait on a slow socket.
+    
+    Args:
+        websocket: The target client websocket
+        frame: JSON text to send
+    """
+    queue = client_queues.get(websocket)
+    if queue is not None:
+        try:
+            queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            schedule_disconnect(websocket)
+
+def schedule_disconnect(websocket):
+    """
+    Disconnect a client whose outbound queue is full, without waiting.
+    
+    The client stops receiving frames immediately; the close handshake
+    runs in a background task and handle_client does the cleanup.
+    
+    Args:
+        websocket: The client websocket to drop
+    """
+    client_queues.pop(websocket, None)
+    logger.warning("Outbound queue full, disconnecting client.")
+    task = asyncio.create_task(websocket.close(code=1013, reason="Client too slow"))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+def sendjson(websocket, obj):
     """
     Send a JSON object to a specific client.
     
@@ -101,19 +268,421 @@ async def sendjson(websocket, obj):
         websocket: The target client websocket
         obj: Python dict to serialize as JSON and send
     """
-    await websocket.send(json.dumps(obj))
+    send_frame(websocket, encode_json(obj))
+
+def broadcast(clients, obj):
+    """
+    Send the same JSON object to several clients.
+    
+    The object is serialized once and the resulting frame is queued
+    for every recipient, instead of one encode per client. Queueing
+    never awaits, so "clients" cannot change size during the loop and
+    is iterated directly, without a snapshot copy.
+    
+    Args:
+        clients: Iterable of target client websockets
+        obj: Python dict to serialize as JSON and send
+    """
+    frame = deflate_frame(encode_json(obj))
+    for client in clients:
+        send_frame(client, frame)
+
+def deflate_frame(frame):
+    """
+    Compress a large encoded frame once, before it is fanned out.
+    
+    Per-connection permessage-deflate is disabled (see main), since it
+    would compress the same broadcast again for every recipient. Frames
+    of COMPRESS_MIN_SIZE bytes or more are instead deflated here and
+    sent as binary frames starting with DEFLATE_PREFIX; smaller frames
+    are returned unchanged, as deflate does not pay off on them.
+    
+    Args:
+        frame: Encoded JSON frame (bytes)
+    
+    Returns:
+        bytes: The frame itself, or DEFLATE_PREFIX + the deflated frame
+    """
+    if len(frame) < COMPRESS_MIN_SIZE:
+        return frame
+    return DEFLATE_PREFIX + zlib.compress(frame, 1)
+
+def encode_batch(frames):
+    """
+    Wrap several encoded frames into a single "batch" frame.
+    
+    The frames are already encoded JSON, so they are joined as-is
+    instead of being decoded and encoded again.
+    
+    Args:
+        frames: List of encoded JSON frames (bytes)
+    
+    Returns:
+        bytes: {"action":"batch","payload":{"items":[...]}} as encoded JSON
+    """
+    return b'{"action":"batch","payload":{"items":[' + b",".join(frames) + b']}}'
+
+async def safe_send(websocket, frame):
+    """
+    Write one frame to a client, bounded in time.
+    
+    A client that cannot absorb a frame within SEND_TIMEOUT raises
+    TimeoutError. There is no limit shared between clients, so a stalled
+    client only ever holds up its own writer; the memory a client can
+    pin is bounded by its MAX_OUTBOUND_QUEUE frames.
+    
+    Args:
+        websocket: The client websocket to write to
+        frame: Encoded JSON to send (bytes, written as a text frame),
+            or a deflated frame (written as a binary frame)
+    """
+    text = not frame.startswith(DEFLATE_PREFIX)
+    await asyncio.wait_for(websocket.send(frame, text=text), timeout=SEND_TIMEOUT)
+
+async def writer_loop(websocket, queue):
+    """
+    Drain a client's outbound queue and write it to the socket.
+    
+    After the first frame arrives the writer waits WRITE_DELAY for more,
+    then merges up to MAX_FRAMES_IN_BATCH queued frames into one batch
+    frame. A chat burst thus costs one websocket frame and one socket
+    write per recipient, at the price of WRITE_DELAY extra latency.
+    Deflated frames cannot be merged and are sent on their own, in order.
+    
+    Once the writer stops (closed connection, timeout or error) the
+    queue is unregistered, so broadcasts skip the dead client at once
+    instead of queueing frames for it until handle_client cleans up.
+    
+    Args:
+        websocket: The client websocket to write to
+        queue: The client's outbound frame queue
+    """
+    try:
+        while True:
+            batch = [await queue.get()]
+            if WRITE_DELAY and queue.qsize() < MAX_FRAMES_IN_BATCH - 1:
+                await asyncio.sleep(WRITE_DELAY)
+            while len(batch) < MAX_FRAMES_IN_BATCH and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            run = []
+            for frame in batch:
+                if not frame.startswith(DEFLATE_PREFIX):
+                    run.append(frame)
+                    continue
+                if run:
+                    await safe_send(websocket, run[0] if len(run) == 1 else encode_batch(run))
+                    run = []
+                await safe_send(websocket, frame)
+            if run:
+                await safe_send(websocket, run[0] if len(run) == 1 else encode_batch(run))
+    except ws.ConnectionClosed:
+        pass
+    except asyncio.TimeoutError:
+        logger.warning("Client too slow, closing connection.")
+        await websocket.close()
+    except Exception:
+        # Close the connection so handle_client runs the usual cleanup
+        logger.exception("Writer failed, closing connection.")
+        await websocket.close()
+    finally:
+        client_queues.pop(websocket, None)
+
+# Pre-encoded error frames. Constant errors are encoded once at import;
+# the "room does not exist" templates only interpolate the room name.
+ERR_NO_ROOM = encode_json({"action": "error", "message": "Room '%s' does not exist."})
+ERR_ROOM_NOT_FOUND = encode_json({"action": "error", "reason": "room_not_found", "detail": "Room '%s' does not exist."})
+ERR_NO_ROOM_SPECIFIED = encode_json({"action": "error", "reason": "no_room_specified", "detail": "No room specified to leave."})
+ERR_CANNOT_LEAVE_DEFAULT = encode_json({"action": "error", "reason": "cannot_leave_default", "detail": "Cannot leave the default room."})
+ERR_CANNOT_DELETE_DEFAULT = encode_json({"action": "error", "reason": "cannot_delete_default", "detail": "Cannot delete the default room."})
+
+def json_escape(room):
+    """
+    Escape a room name for interpolation inside a JSON string template.
+    
+    Args:
+        room: Room name as received from the client (any type)
+    
+    Returns:
+        bytes: The JSON-escaped text, without the surrounding quotes
+    """
+    return encode_json(str(room))[1:-1]
+
+# Encoded "joined"/"left" frames, memoized per room name. Room names come
+# from a small set, so repeated joins and leaves skip encoding; maxsize
+# bounds the memory kept for deleted or one-off names.
+@lru_cache(maxsize=256)
+def joined_frame(room):
+    """Get the encoded {"action": "joined", "payload": {"room": room}} frame."""
+    return encode_json({"action": "joined", "payload": {"room": room}})
+
+@lru_cache(maxsize=256)
+def left_frame(room):
+    """Get the encoded {"action": "left", "payload": {"room": room}} frame."""
+    return encode_json({"action": "left", "payload": {"room": room}})
 
 def get_rooms_with_counts():
     """
     Get all rooms with their current user counts.
     
+    The counts are maintained incrementally by join_room, leave_room,
+    createRoom and deleteRoom, so no room is iterated here.
+    
     Returns:
-        dict: Maps room_name -> user_count
+        dict: Maps room_name -> user_count (the live counter, do not modify)
     """
-    rooms_data = {}
-    for room_name, room_clients in rooms.items():
-        rooms_data[room_name] = len(room_clients)
-    return rooms_data
+    return room_counts
+
+def index_room(room):
+    """Add a new room name to the sorted room_names index."""
+    if isinstance(room, str):   # Only names can match a prefix
+        bisect.insort(room_names, room)
+
+def unindex_room(room):
+    """Remove a deleted room name from the sorted room_names index."""
+    if isinstance(room, str):
+        i = bisect.bisect_left(room_names, room)
+        if i < len(room_names) and room_names[i] == room:
+            del room_names[i]
+
+def rooms_with_prefix(prefix):
+    """
+    Get the rooms whose name starts with a prefix, with their user counts.
+    
+    Matching names are contiguous in the sorted room_names, so the
+    first one is found by binary search and only matches are visited.
+    
+    Args:
+        prefix: Start of the room names to match ("" matches every room)
+    
+    Returns:
+        dict: Maps room_name -> user_count for the matching rooms
+    """
+    result = {}
+    for i in range(bisect.bisect_left(room_names, prefix), len(room_names)):
+        name = room_names[i]
+        if not name.startswith(prefix):
+            break
+        result[name] = room_counts[name]
+    return result
+
+def invalidate_rooms_list():
+    """Drop the cached roomsList frame after a room or membership change."""
+    global rooms_list_cache
+    rooms_list_cache = None
+
+def rooms_list_frame():
+    """
+    Get the encoded roomsList frame, rebuilding it only after invalidation.
+    
+    Back-to-back broadcasts and roomsList requests reuse the same bytes
+    until a room is created/deleted or a room's user count changes.
+    
+    Returns:
+        bytes: {"action":"roomsList","rooms":{...}} as encoded JSON,
+            deflated when large (see deflate_frame)
+    """
+    global rooms_list_cache
+    if rooms_list_cache is None:
+        rooms_list_cache = deflate_frame(encode_json({"action": "roomsList", "rooms": get_rooms_with_counts()}))
+    return rooms_list_cache
+
+def broadcast_rooms_list():
+    """Queue the current roomsList frame for every connected client (no await, no snapshot needed)."""
+    frame = rooms_list_frame()
+    for client in connected_clients:
+        send_frame(client, frame)
+
+def join_room(websocket, room):
+    """
+    Add a client to an existing room, updating rooms and client_rooms together.
+    
+    Args:
+        websocket: The client websocket
+        room: Name of a room present in rooms
+    
+    Returns:
+        bool: True if the client was not in the room yet
+    
+    Raises:
+        KeyError: If the room does not exist (nothing is changed)
+    """
+    members = rooms[room]
+    if websocket in members:
+        return False
+    if members is EMPTY_ROOM:
+        # First member: give the room its own set
+        members = rooms[room] = set()
+    members.add(websocket)
+    room_counts[room] += 1
+    client_rooms.setdefault(websocket, set()).add(room)
+    invalidate_rooms_list()
+    return True
+
+def leave_room(websocket, room):
+    """
+    Remove a client from a room, updating rooms and client_rooms together.
+    
+    Args:
+        websocket: The client websocket
+        room: Room name (missing rooms are ignored)
+    
+    Returns:
+        bool: True if the client was in the room
+    """
+    members = rooms.get(room)
+    if members is None or websocket not in members:
+        return False
+    members.remove(websocket)
+    room_counts[room] -= 1
+    if not members and room != "default":
+        # Last member left: drop the set, the room itself is kept
+        rooms[room] = EMPTY_ROOM
+    client_rooms.get(websocket, set()).discard(room)
+    invalidate_rooms_list()
+    return True
+
+# ==================================================================
+# ACTION HANDLERS
+# ==================================================================
+# Each handler receives (websocket, action, state) where "action" is the
+# decoded client message (an Action) and "state" is the sender's ClientState.
+
+async def _handle_create_room(websocket, action, state):
+    """Create a new room and broadcast the updated room list."""
+    room = action.room
+    if room and room not in rooms:
+        rooms[room] = EMPTY_ROOM
+        room_counts[room] = 0
+        index_room(room)
+        invalidate_rooms_list()
+        logger.info("Created room: %s", room)
+        # Broadcast 
+        broadcast_rooms_list()
+
+async def _handle_join_room(websocket, action, state):
+    """Join an existing room (multi-join supported)."""
+    room = action.room
+    try:
+        join_room(websocket, room)
+    except KeyError:
+        send_frame(websocket, ERR_NO_ROOM % json_escape(room))
+        return
+
+    # Notify client that it joined
+    send_frame(websocket, joined_frame(room))
+
+    # Broadcast updated room counts
+    broadcast_rooms_list()
+
+async def _handle_leave_room(websocket, action, state):
+    """Leave a specific room (expecting 'room' parameter)."""
+    room = action.room
+    if not room:
+        send_frame(websocket, ERR_NO_ROOM_SPECIFIED)
+        return
+
+    if room == "default":
+        send_frame(websocket, ERR_CANNOT_LEAVE_DEFAULT)
+        return
+
+    # The client stays in "default", which cannot be left
+    if leave_room(websocket, room):
+        logger.info("Client left room.")
+
+    send_frame(websocket, left_frame(room))
+
+    # Broadcast updated room counts
+    broadcast_rooms_list()
+
+async def _handle_delete_room(websocket, action, state):
+    """Delete room if it exists and client has permission."""
+    room = action.room
+    if room == "default":
+        send_frame(websocket, ERR_CANNOT_DELETE_DEFAULT)
+        return
+    
+    if room and room in rooms:
+        # Delete the room; its members remain in "default"
+        members = rooms.pop(room)
+        del room_counts[room]
+        unindex_room(room)
+        for client in members:
+            client_rooms.get(client, set()).discard(room)
+            join_room(client, "default")
+        invalidate_rooms_list()
+        frame = left_frame(room)
+        for client in members:
+            send_frame(client, frame)
+        logger.info("Room deleted: %s", room)
+        
+        # Broadcast updated room list to all clients
+        broadcast_rooms_list()
+    else:
+        send_frame(websocket, ERR_ROOM_NOT_FOUND % json_escape(room))
+
+async def _handle_send_message(websocket, action, state):
+    """Broadcast a chat message to everyone in the specified room."""
+    msg = action.message
+    room = action.room
+    if not msg or not room:
+        return # Ignore empty messages or missing room
+
+    try:
+        members = rooms[room]
+    except KeyError:
+        send_frame(websocket, ERR_ROOM_NOT_FOUND % json_escape(room))
+        return
+
+    # Patch the sender's template instead of building new dicts; broadcast
+    # encodes it before returning, so it can be reset right after
+    payload = state.message["payload"]
+    payload["room"] = room
+    payload["message"] = msg
+    broadcast(members, state.message)
+    payload["message"] = None
+
+async def _handle_identify(websocket, action, state):
+    """Identify user."""
+    username = (action.payload or {}).get("username", "")
+    if username:
+        state.set_username(username)
+
+async def _handle_rename(websocket, action, state):
+    """Change the username of the client."""
+    username = action.newUsername
+    if username:
+        state.set_username(username)
+
+async def _handle_rooms_list(websocket, action, state):
+    """Send the room list with user counts to the requesting client."""
+    send_frame(websocket, rooms_list_frame())
+
+async def _handle_rooms_list_prefix(websocket, action, state):
+    """Send the rooms whose name starts with the given prefix (type-ahead)."""
+    prefix = (action.payload or {}).get("prefix", "")
+    if not isinstance(prefix, str):
+        prefix = ""
+    send_frame(websocket, deflate_frame(encode_json(
+        {"action": "roomsListPrefix", "prefix": prefix, "rooms": rooms_with_prefix(prefix)})))
+
+async def _handle_unknown(websocket, action, state):
+    """Fallback for unrecognised actions."""
+    print("Not an action...")
+    logger.error("Not an action...")
+
+# Dispatch table: action name -> handler coroutine (one dict lookup per message)
+HANDLERS = {
+    "createRoom": _handle_create_room,
+    "joinRoom": _handle_join_room,
+    "leaveRoom": _handle_leave_room,
+    "deleteRoom": _handle_delete_room,
+    "sendMessage": _handle_send_message,
+    "identify": _handle_identify,
+    "rename": _handle_rename,
+    "roomsList": _handle_rooms_list,
+    "roomsListPrefix": _handle_rooms_list_prefix,
+}
 
 # ==================================================================
 # CLIENT CONNECTION HANDLER
@@ -124,7 +693,7 @@ async def handle_client(websocket):
     
     Manages client lifecycle:
     1. Registration and identification
-    2. Message routing and broadcasting
+    2. Message routing and broadcasting (via HANDLERS)
     3. Room management (join/leave/create/delete)
     4. User presence tracking
     5. Cleanup on disconnect
@@ -133,195 +702,95 @@ async def handle_client(websocket):
     # await sendjson(websocket, {"action": "getIP", "IP": ipaddress})
 
     # Register the new client
-    logging.info(f"Client connected: {websocket}")
+    peer = str(websocket.remote_address)
+    logger.debug("Client connected: %s", peer)
     connected_clients.add(websocket)
-    logging.info(f"Connected clients: {len(connected_clients)}")
+    logger.debug("Connected clients: %d", len(connected_clients))
     
     # Assign default username (temporary, client can rename via "identify" action)
-    users[websocket] = "User_" + str(datetime.datetime.now().timestamp())
-    logging.info(f"User: {users[websocket]}")
+    state = ClientState(username=f"User_{next(anon_ids)}", peer=peer)
+    logger.debug("User: %s", state.username)
+
+    # Outbound queue drained by a dedicated writer task
+    client_queues[websocket] = asyncio.Queue(maxsize=MAX_OUTBOUND_QUEUE)
+    writer = asyncio.create_task(writer_loop(websocket, client_queues[websocket]))
 
     # Auto-join client to "default" room on connection
-    rooms["default"].add(websocket)
-    client_rooms[websocket] = set(["default"])
+    join_room(websocket, "default")
 
     try:
         # Send current room list with user counts to the new client
-        await sendjson(websocket, {
+        sendjson(websocket, {
             "action": "roomsList", 
             "payload": {"rooms": get_rooms_with_counts()}
         })
 
         async for raw in websocket:
-            action = json.loads(raw)
-
-            # Listen to the action
-            match action.get("action"):
-                case "createRoom":
-                    room = action.get("room")
-                    if room and room not in rooms:
-                        rooms[room] = set()
-                        logging.info(f"Created room: {action['room']}")
-                        # Broadcast 
-                        for client in connected_clients:
-                            await sendjson(client, {"action": "roomsList", "rooms": get_rooms_with_counts()})
-
-                case "joinRoom":
-                    # Join room (multi-join supported)
-                    room = action.get("room")
-                    if room not in rooms:
-                        await sendjson(websocket, {"action": "error", "message": f"Room '{room}' does not exist."}) 
-                        continue
-
-                    # Add the websocket to the room and track in client_rooms set
-                    rooms[room].add(websocket)
-                    client_rooms.setdefault(websocket, set()).add(room)
-
-                    # Notify client that it joined
-                    await sendjson(websocket, {
-                        "action": "joined",
-                        "payload": {"room": room}
-                    })
-
-                    # Broadcast updated room counts
-                    for client in connected_clients:
-                        await sendjson(client, {"action": "roomsList", "rooms": get_rooms_with_counts()})
-
-                case "leaveRoom":
-                    # Leave a specific room (expecting 'room' parameter)
-                    room = action.get("room")
-                    if not room:
-                        await sendjson(websocket, {"action": "error", "reason": "no_room_specified", "detail": "No room specified to leave."})
-                        continue
-
-                    if room == "default":
-                        await sendjson(websocket, {"action": "error", "reason": "cannot_leave_default", "detail": "Cannot leave the default room."})
-                        continue
-
-                    if room in rooms and websocket in rooms[room]:
-                        rooms[room].remove(websocket)
-                        # Ensure client still has default
-                        client_rooms.get(websocket, set()).discard(room)
-                        client_rooms.get(websocket, set()).add("default")
-                        logging.info("Client left room.")
-
-                    await sendjson(websocket, {
-                        "action": "left",
-                        "payload": {"room": room}
-                    })
-
-                    # Broadcast updated room counts
-                    for client in connected_clients:
-                        await sendjson(client, {"action": "roomsList", "rooms": get_rooms_with_counts()})
-
-                case "deleteRoom":
-                    # Delete room if it exists and client has permission
-                    room = action.get("room")
-                    if room == "default":
-                        await sendjson(websocket, {"action": "error", "reason": "cannot_delete_default", "detail": "Cannot delete the default room."})
-                        continue
-                    
-                    if room and room in rooms:
-                        # Move all clients in room to default
-                        for client in list(rooms[room]):
-                            rooms["default"].add(client)
-                            # remove the deleted room from client's set and ensure default present
-                            client_rooms.get(client, set()).discard(room)
-                            client_rooms.get(client, set()).add("default")
-                            await sendjson(client, {
-                                "action": "left",
-                                "payload": {"room": room}
-                            })
-                        
-                        # Delete the room
-                        del rooms[room]
-                        logging.info(f"Room deleted: {room}")
-                        
-                        # Broadcast updated room list to all clients
-                        for client in connected_clients:
-                            await sendjson(client, {"action": "roomsList", "rooms": get_rooms_with_counts()})
-                    else:
-                        await sendjson(websocket, {"action": "error", "reason": "room_not_found", "detail": f"Room '{room}' does not exist."})
-
-                case "sendMessage":
-                    msg = action.get("message")
-                    room = action.get("room")
-                    if not msg or not room:
-                        continue # Ignore empty messages or missing room
-
-                    if room not in rooms:
-                        await sendjson(websocket, {"action": "error", "reason": "room_not_found", "detail": f"Room '{room}' does not exist."})
-                        continue
-
-                    # Broadcast message to everyone in the specified room
-                    message_obj = {
-                        "action": "message",
-                        "payload": {
-                            "from": users.get(websocket, "Unknown"),
-                            "room": room,
-                            "message": msg
-                        }
-                    }
-
-                    for client in rooms[room]:
-                        await client.send(json.dumps(message_obj))
-
-                case "identify":
-                    # Identify user
-                    username = action.get("payload", {}).get("username", "")
-                    if username:
-                        users[websocket] = username
-                
-                case "rename":
-                    username = action.get("newUsername")
-                    if username:
-                        users[websocket] = username
-
-                case "roomsList":
-                    await sendjson(websocket, {"action": "roomsList", "rooms": get_rooms_with_counts()})
-
-                case _:
-                    print("Not an action...")
-                    logging.error("Not an action...")
+            # orjson, json and msgspec decode errors are all ValueErrors
+            try:
+                action = decode_action(raw)
+            except ValueError:
+                logger.warning("Ignoring malformed message from %s", state.peer)
+                continue
+
+            # Dispatch the action to its handler
+            handler = HANDLERS.get(action.action, _handle_unknown)
+            await handler(websocket, action, state)
 
     except Exception as e:
-        logging.exception(f"Error handling client: {e}")
+        logger.exception("Error handling client: %s", e)
 
     # If client disconnect -> async loop ends and finally block gets executed
     finally:
         # Remove client from all rooms they belonged to
-        rooms_set = client_rooms.get(websocket, set())
-        for r in list(rooms_set):
-            try:
-                rooms[r].remove(websocket)
-            except Exception:
-                pass
+        for r in tuple(client_rooms.get(websocket, ())):
+            leave_room(websocket, r)
         client_rooms.pop(websocket, None)
 
+        # Stop the writer task and drop the outbound queue
+        writer.cancel()
+        client_queues.pop(websocket, None)
+
         # Broadcast updated room counts
-        for client in connected_clients:
-            try:
-                await sendjson(client, {"action": "roomsList", "rooms": get_rooms_with_counts()})
-            except Exception:
-                pass
+        broadcast_rooms_list()
 
         # Unregister the client
-        logging.warning("Client disconnected.")
-        connected_clients.remove(websocket)
+        logger.warning("Client disconnected: %s", state.peer)
+        connected_clients.discard(websocket)
 
 # Function to start the WebSocket server
 async def main():                                      
     # Set up WebSocket server that listens on port 20200
     # Every time a client connects, server will handle the
     # connection using the handle_client function  
-    server = await ws.serve(handle_client, "0.0.0.0", 20200)
-    logging.info("Server running.")
+    # permessage-deflate costs more CPU than it saves on small chat frames
+    # and would recompress each broadcast per recipient (large broadcasts
+    # are deflated once in deflate_frame instead); small limits keep the
+    # memory of idle connections low
+    server = await serve(
+        handle_client, "0.0.0.0", 20200,
+        compression=None,
+        max_size=MAX_MESSAGE_SIZE,
+        max_queue=MAX_QUEUE,
+        write_limit=WRITE_LIMIT,
+        ping_interval=PING_INTERVAL,
+        ping_timeout=PING_TIMEOUT,
+    )
+    logger.info("Server running.")
     print("Server running.")
 
+    # Read stdin on a dedicated daemon thread instead of the default executor
+    cli_q = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+    threading.Thread(target=stdin_reader, args=(loop, cli_q), name="cli-stdin", daemon=True).start()
+
     await asyncio.gather(
-        cli(server), # CLI
+        cli(server, cli_q), # CLI
         server.wait_closed() # Websocket task
     )
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())